@@ -0,0 +1,103 @@
+# screener/_ta_kernels.py
+"""
+Numeric core of compute_signals. Plain loops over contiguous arrays so Numba
+can compile them; without Numba installed the same code runs as Python.
+Inputs may be float32 (half the memory traffic); accumulation is float64.
+Compiled with nogil so compute_signals_many can run symbols on threads.
+"""
+from typing import Tuple
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - numba is optional
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+# slope() fits a line through the last 5 SMA points; x = 0..4, so the centred
+# x is -2..2 and its sum of squares is 10
+SLOPE_N = 5
+_XDEN = 10.0
+
+
+@njit(cache=True, nogil=True)
+def _wilder_rsi(close: np.ndarray, n: int) -> float:
+    # ta's RSIIndicator: alpha=1/n EMA of gains/losses, seeded at the first bar
+    size = close.shape[0]
+    if size < n:
+        return np.nan
+    a = 1.0 / n
+    up = 0.0
+    dn = 0.0
+    for i in range(1, size):
+        d = float(close[i]) - float(close[i - 1])
+        g = d if d > 0.0 else 0.0
+        l = -d if d < 0.0 else 0.0
+        up += a * (g - up)
+        dn += a * (l - dn)
+    if dn == 0.0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + up / dn)
+
+
+@njit(cache=True, nogil=True)
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, i: int) -> float:
+    tr = float(high[i]) - float(low[i])
+    if i > 0:
+        prev = float(close[i - 1])
+        tr = max(tr, abs(float(high[i]) - prev), abs(float(low[i]) - prev))
+    return tr
+
+
+@njit(cache=True, nogil=True)
+def _wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int) -> float:
+    # ta's AverageTrueRange: first-n mean true range, then (prev*(n-1) + tr) / n
+    size = close.shape[0]
+    if size < n:
+        return 0.0
+    atr = 0.0
+    for i in range(n):
+        atr += _true_range(high, low, close, i)
+    atr /= n
+    for i in range(n, size):
+        atr = (atr * (n - 1) + _true_range(high, low, close, i)) / n
+    return atr
+
+
+@njit(cache=True, nogil=True)
+def _sma_slope(close: np.ndarray, n: int) -> float:
+    # least-squares slope of the last SLOPE_N values of the n-SMA,
+    # relative to the latest SMA value
+    size = close.shape[0]
+    if size < n + SLOPE_N - 1:
+        return 0.0
+    y = np.empty(SLOPE_N)
+    s = 0.0
+    for i in range(size - n, size):
+        s += float(close[i])
+    y[SLOPE_N - 1] = s / n
+    for j in range(1, SLOPE_N):
+        s += float(close[size - n - j]) - float(close[size - j])
+        y[SLOPE_N - 1 - j] = s / n
+    ybar = 0.0
+    for j in range(SLOPE_N):
+        ybar += y[j]
+    ybar /= SLOPE_N
+    m = 0.0
+    for j in range(SLOPE_N):
+        m += (j - (SLOPE_N - 1) / 2.0) * (y[j] - ybar)
+    m /= _XDEN
+    last = y[SLOPE_N - 1]
+    return m / (last if last != 0.0 else 1.0)
+
+
+@njit(cache=True, nogil=True)
+def signals_kernel(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> Tuple[float, float, float, float]:
+    """(rsi, atr_pct, slope20, slope200) for aligned close/high/low arrays."""
+    rsi = _wilder_rsi(close, 14)
+    atr = _wilder_atr(high, low, close, 14)
+    last = float(close[-1]) if close.shape[0] else 0.0
+    atr_pct = 100.0 * atr / last if last != 0.0 else 0.0
+    return rsi, atr_pct, _sma_slope(close, 20), _sma_slope(close, 200)
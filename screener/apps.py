@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ScreenerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'screener'
+
+    def ready(self):
+        from . import universe  # noqa: F401  (connects the Ticker invalidation signals)
@@ -0,0 +1,61 @@
+# screener/cache_utils.py
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from django.core.cache import cache
+
+# a stale copy outlives the fresh one so waiters have something to serve
+STALE_TTL_FACTOR = 4
+
+
+class SingleFlightTimeout(Exception):
+    """No fresh or stale value turned up within `wait`; the caller should answer 503."""
+
+
+async def cache_single_flight(key: str, ttl: int, producer: Callable[[], Awaitable[Any]],
+                              lock_timeout: int = 60, wait: Optional[float] = None,
+                              poll: float = 0.25) -> Any:
+    """
+    cache.aget(key), or on a miss run `producer()` in a single worker only.
+
+    The first caller to miss takes a `cache.aadd` lock (held at most
+    `lock_timeout` seconds, so size it from the producer's worst case) and
+    recomputes; concurrent callers get the stale copy kept under `<key>:stale`
+    if there is one, otherwise they poll for the fresh value. A waiter takes
+    over only if the lock is released without a value (the holder failed);
+    after `wait` seconds (default: `lock_timeout`) it raises
+    SingleFlightTimeout rather than recomputing alongside the holder.
+    All cache I/O is awaited, so a slow backend never stalls the event loop.
+    """
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    stale_key = f"{key}:stale"
+    deadline = time.monotonic() + (lock_timeout if wait is None else wait)
+    first = True
+    while True:
+        if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+            try:
+                data = await producer()
+                await cache.aset(key, data, timeout=ttl)
+                await cache.aset(stale_key, data, timeout=ttl * STALE_TTL_FACTOR)
+                return data
+            finally:
+                await cache.adelete(lock_key)
+
+        if first:
+            # the stale copy is written together with the fresh one, so one look is enough
+            data = await cache.aget(stale_key)
+            if data is not None:
+                return data
+            first = False
+
+        if time.monotonic() >= deadline:
+            raise SingleFlightTimeout(key)
+        await asyncio.sleep(poll)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
 from screener.models import Ticker
+from screener.universe import invalidate_universe
 import csv
 from pathlib import Path
 
@@ -17,41 +19,55 @@ class Command(BaseCommand):
             return
 
         # Read nifty50 list (robust to accidental header, .NS suffix, spaces)
-        nifty50 = set()
         with nf.open(newline="") as f:
-            for raw in f:
-                sym = raw.strip()
-                if not sym or sym.upper() in {"SYMBOL", "TICKER"}:
-                    continue
-                sym = sym.upper().replace(".NS", "")
-                nifty50.add(sym)
-
-        created = 0
-        updated = 0
+            syms = (line.strip().upper() for line in f)
+            nifty50 = {sym.replace(".NS", "") for sym in syms if sym and sym not in {"SYMBOL", "TICKER"}}
 
         # Read universe with header TICKER,NAME
+        # symbol -> (name, in50); a later duplicate row wins, as before
+        rows = {}
         with uni.open(newline="") as f:
-            reader = csv.DictReader(f)
-            if set(reader.fieldnames or []) != {"TICKER", "NAME"}:
+            # plain csv.reader: the two columns are fixed, no need for a dict per row
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if set(header) != {"TICKER", "NAME"} or len(header) != 2:
                 self.stdout.write(self.style.ERROR("universe.csv must have header exactly: TICKER,NAME"))
                 return
+            i_tk, i_name = header.index("TICKER"), header.index("NAME")
 
             for row in reader:
-                raw = (row["TICKER"] or "").strip()
-                name = (row.get("NAME") or "").strip()
+                if len(row) <= i_tk:
+                    continue
+                raw = row[i_tk].strip()
+                name = row[i_name].strip() if len(row) > i_name else ""
                 if not raw:
                     continue
 
                 base_sym = raw.upper().replace(".NS", "")
                 sym_yf = f"{base_sym}.NS"  # Yahoo Finance ticker
-                in50 = base_sym in nifty50
-
-                obj, is_created = Ticker.objects.update_or_create(
-                    symbol=sym_yf,
-                    defaults={"name": name, "in_nifty50": in50},
-                )
-                created += int(is_created)
-                updated += int(not is_created)
+                rows[sym_yf] = (name, base_sym in nifty50)
+
+        # One SELECT for the existing rows, then batched INSERT/UPDATE
+        # instead of a SELECT + write per CSV row.
+        with transaction.atomic():
+            existing = Ticker.objects.in_bulk(list(rows), field_name="symbol")
+            to_create = []
+            to_update = []
+            for sym_yf, (name, in50) in rows.items():
+                obj = existing.get(sym_yf)
+                if obj is None:
+                    to_create.append(Ticker(symbol=sym_yf, name=name, in_nifty50=in50))
+                elif obj.name != name or obj.in_nifty50 != in50:
+                    obj.name = name
+                    obj.in_nifty50 = in50
+                    to_update.append(obj)
+
+            Ticker.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+            Ticker.objects.bulk_update(to_update, ["name", "in_nifty50"], batch_size=500)
+        invalidate_universe()  # bulk writes don't fire the post_save hook
+
+        created = len(to_create)
+        updated = len(existing)
 
         nifty_count = Ticker.objects.filter(in_nifty50=True).count()
         total = Ticker.objects.count()
@@ -0,0 +1,36 @@
+# screener/params.py
+"""Query-param parsing shared by the API views: bad or missing values fall back to the default."""
+import math
+import re
+from typing import Optional
+
+# what float() took before, minus nan/inf (overflow to inf is caught after conversion)
+_FLOAT_RE = re.compile(r"^\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*$")
+_TRUE = frozenset({"1", "true", "yes", "on", "y"})
+
+
+def _finite(v: Optional[str]) -> Optional[float]:
+    if v is None or not _FLOAT_RE.match(v):
+        return None
+    x = float(v)  # "1e400" parses, to inf
+    return x if math.isfinite(x) else None
+
+
+def get_float(request, name: str, default: float) -> float:
+    x = _finite(request.GET.get(name))
+    return default if x is None else x
+
+
+def get_int(request, name: str, default: int) -> int:
+    # "20.0" is taken (truncated) rather than silently defaulted
+    x = _finite(request.GET.get(name))
+    return default if x is None else int(x)
+
+
+def is_true(v: Optional[str]) -> bool:
+    return (v or "").strip().lower() in _TRUE
+
+
+def get_bool(request, name: str, default: bool = False) -> bool:
+    v = request.GET.get(name)
+    return default if v is None else is_true(v)
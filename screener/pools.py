@@ -0,0 +1,57 @@
+# screener/pools.py
+import asyncio
+import atexit
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# news + events fan out side by side, FANOUT_LIMIT (16) each
+ENRICH_WORKERS = 32
+CPU_WORKERS = os.cpu_count() or 4
+# the views' blocking steps (scan, history fetch, signals); separate from the
+# cpu pool because compute_signals_many itself waits on that one
+VIEW_WORKERS = 8
+
+_POOLS: Dict[str, ThreadPoolExecutor] = {}
+_LOCK = threading.Lock()
+
+
+def get_pool(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """
+    Long-lived executor shared across requests. Created on first use, so a
+    preforking server (gunicorn --preload) never forks a parent's threads.
+    """
+    pool = _POOLS.get(name)
+    if pool is None:
+        with _LOCK:
+            pool = _POOLS.get(name)
+            if pool is None:
+                pool = _POOLS[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+    return pool
+
+
+def enrich_pool() -> ThreadPoolExecutor:
+    return get_pool("enrich", ENRICH_WORKERS)
+
+
+def cpu_pool() -> ThreadPoolExecutor:
+    return get_pool("cpu", CPU_WORKERS)
+
+
+def view_pool() -> ThreadPoolExecutor:
+    return get_pool("view", VIEW_WORKERS)
+
+
+async def run_in_pool(pool: ThreadPoolExecutor, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    # asyncio.to_thread and sync_to_async(thread_sensitive=False) both use the
+    # loop's default executor, which is rebuilt with every per-request event
+    # loop under WSGI
+    return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+@atexit.register
+def _shutdown():
+    for pool in list(_POOLS.values()):
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,133 @@
+# screener/responses.py
+import functools
+import gzip
+import hashlib
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import orjson
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+try:  # optional: brotli is offered only when installed
+    import brotli
+except ImportError:
+    brotli = None
+
+from .cache_utils import SingleFlightTimeout, cache_single_flight
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# payloads move every 10-30 min; let clients/proxies reuse them for 5 and revalidate after
+CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=1800"
+
+# what a client told to come back later (the first fill is still running) waits
+BUSY_RETRY_AFTER = 10  # seconds
+
+# bump when the cached entry's shape changes, so old entries are never misread
+_KEY_PREFIX = "json:v2:"
+# below this, compression isn't worth a Content-Encoding (same cut-off as GZipMiddleware)
+MIN_COMPRESS = 200
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+_ENCODING_RE = re.compile(r"\s*([\w-]+)\s*(?:;\s*q=(\d+(?:\.\d*)?))?")
+
+
+class ORJsonResponse(HttpResponse):
+    """JsonResponse, serialized with orjson (much faster on large float-heavy payloads)."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(orjson.dumps(data, option=ORJSON_OPTIONS), **kwargs)
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def _encode_entry(raw: bytes) -> Dict[str, Any]:
+    """Everything a hit needs, computed once per cache fill."""
+    entry = {"raw": raw, "ts": time.time(), "etag": _digest(raw)}
+    if len(raw) >= MIN_COMPRESS:
+        entry["gzip"] = gzip.compress(raw, GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            entry["br"] = brotli.compress(raw, quality=BROTLI_QUALITY)
+    return entry
+
+
+def _pick_encoding(request, entry: Dict[str, Any]) -> str:
+    """br, then gzip, then identity, limited to what the client accepts and we hold."""
+    accepted = set()
+    for m in _ENCODING_RE.finditer(request.headers.get("Accept-Encoding", "")):
+        if m.group(2) is None or float(m.group(2)) > 0:
+            accepted.add(m.group(1).lower())
+    for enc in ("br", "gzip"):
+        if enc in accepted and enc in entry:
+            return enc
+    return "identity"
+
+
+def _weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _not_modified(request, etag: str, ts: float) -> bool:
+    inm = request.headers.get("If-None-Match")
+    if inm is not None:
+        # weak comparison (RFC 9110 13.1.2): W/ prefixes don't matter for a GET
+        etags = parse_etags(inm)
+        return etags == ["*"] or _weak(etag) in {_weak(e) for e in etags}
+    ims = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return ims is not None and int(ts) <= ims
+
+
+async def cached_json(request, key: str, ttl: int, producer: Callable[[], Awaitable[Any]],
+                      **single_flight) -> HttpResponse:
+    """
+    Serve `producer()`'s payload as JSON, caching the encoded bytes (plus gzip /
+    brotli copies) under `key` (single-flight, see cache_single_flight) so hits
+    never re-serialize or re-compress. Sends ETag / Last-Modified /
+    Cache-Control / Vary and answers a matching If-None-Match (or
+    If-Modified-Since) with 304. While a first fill outlasts the wait, answers
+    503 with Retry-After instead of starting a second computation.
+    """
+    async def encoded():
+        return _encode_entry(orjson.dumps(await producer(), option=ORJSON_OPTIONS))
+
+    try:
+        entry = await cache_single_flight(_KEY_PREFIX + key, ttl, encoded, **single_flight)
+    except SingleFlightTimeout:
+        resp = ORJsonResponse({"error": "still computing, retry shortly"}, status=503)
+        resp["Retry-After"] = str(BUSY_RETRY_AFTER)
+        resp["Cache-Control"] = "no-store"
+        return resp
+    enc = _pick_encoding(request, entry)
+    # each encoding is its own representation, so it gets its own tag
+    etag = f'"{entry["etag"]}"' if enc == "identity" else f'"{entry["etag"]}-{enc}"'
+    if _not_modified(request, etag, entry["ts"]):
+        resp = HttpResponseNotModified()
+    else:
+        resp = HttpResponse(entry["raw"] if enc == "identity" else entry[enc], content_type="application/json")
+        if enc != "identity":
+            resp["Content-Encoding"] = enc
+    resp["ETag"] = etag
+    resp["Last-Modified"] = http_date(entry["ts"])
+    resp["Cache-Control"] = CACHE_CONTROL
+    patch_vary_headers(resp, ("Accept-Encoding",))
+    return resp
+
+
+def etag_cached_json(ttl: int, **single_flight):
+    """
+    Decorator for async API views that return `(cache_key, producer)`;
+    the response is built by cached_json.
+    """
+    def deco(view: Callable[..., Awaitable[Tuple[str, Callable[[], Awaitable[Any]]]]]):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            key, producer = await view(request, *args, **kwargs)
+            return await cached_json(request, key, ttl, producer, **single_flight)
+        return wrapper
+    return deco
@@ -1,9 +1,15 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import threading
+import time
 import pandas as pd
 import numpy as np
 import yfinance as yf
+from cachetools import TTLCache
+from django.conf import settings
+from .universe import UniverseTicker
 
 @dataclass
 class ScanResult:
@@ -13,56 +19,314 @@ class ScanResult:
     sma200: float
     distance_pct: float  # signed distance (close - sma)/sma
     in_nifty50: bool
+    base: str  # symbol without the .NS suffix
+    display: str  # base, tagged " (NIFTY50)" for index members
 
 
-def fetch_history(symbol: str, period: str = "420d") -> Optional[pd.DataFrame]:
+# yf.download fans a chunk out over its own threads; keep chunks modest so one
+# bad symbol or a throttled request doesn't sink the whole universe.
+DOWNLOAD_CHUNK = 50
+DOWNLOAD_THREADS = 10
+DOWNLOAD_TIMEOUT = 10  # seconds per Yahoo request
+# one chunk, worst case: DOWNLOAD_CHUNK / DOWNLOAD_THREADS rounds of two
+# requests per ticker (timezone lookup + history), each up to the timeout
+DOWNLOAD_WORST_CASE = -(-DOWNLOAD_CHUNK // DOWNLOAD_THREADS) * 2 * DOWNLOAD_TIMEOUT
+
+# yf.download isn't thread-safe: every call resets the module-global results
+# dict its worker threads fill, then spins until it holds every ticker. Two
+# overlapping calls lose each other's symbols or spin forever, so calls from
+# the shared view pool take turns.
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
+# Daily bars are cached per symbol on disk. Within the TTL a file is served
+# as-is (the last bar may be today's partial one, hence the TTL); a stale file
+# only needs the bars since its last date. Past bars do change on a split or
+# bonus issue (Yahoo back-adjusts Close even with auto_adjust=False), so the
+# incremental fetch overlaps one settled bar and checks it and the split
+# column; on any sign of re-adjustment the full window is fetched again.
+# Files older than HISTORY_CACHE_MAX_AGE since their last full fetch are
+# refetched regardless.
+HISTORY_CACHE_DIR = Path(settings.BASE_DIR) / "data" / "cache"
+HISTORY_CACHE_TTL = 15 * 60  # seconds
+HISTORY_CACHE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+FULL_FETCH_ATTR = "full_fetch_ts"  # kept in the frame's attrs (round-trips via parquet)
+SPLIT_COLUMN = "Stock Splits"
+ADJUST_RTOL = 1e-3  # a settled close moving more than this means re-adjusted history
+
+# In-process memo in front of all of that, so views rendering the same symbols
+# (scan, then signals for the matches) reuse one frame instead of re-reading.
+# Frames are shared between callers: treat them as read-only.
+_HISTORY_MEMO: TTLCache = TTLCache(maxsize=2048, ttl=300)
+_HISTORY_MEMO_LOCK = threading.Lock()
+
+
+def _download(symbols: List[str], interval: str = "1d", keep_splits: bool = False,
+              **window) -> Dict[str, pd.DataFrame]:
+    """
+    Batch OHLCV download: one yf.download call per chunk of symbols instead of
+    one request per ticker. `window` is passed through (period=... or start=...).
+    `keep_splits` keeps the split column for the cache's re-adjustment check.
+    Symbols with no data are left out of the result.
+    """
+    out: Dict[str, pd.DataFrame] = {}
+    for i in range(0, len(symbols), DOWNLOAD_CHUNK):
+        chunk = symbols[i:i + DOWNLOAD_CHUNK]
+        try:
+            with _YF_DOWNLOAD_LOCK:
+                raw = yf.download(
+                    tickers=chunk,  # a list: symbols may contain spaces ("NIFTY 50")
+                    interval=interval,
+                    group_by="ticker",
+                    auto_adjust=False,
+                    actions=keep_splits,
+                    threads=DOWNLOAD_THREADS,
+                    timeout=DOWNLOAD_TIMEOUT,
+                    progress=False,
+                    **window,
+                )
+        except Exception:
+            continue
+        if raw is None or raw.empty:
+            continue
+        for symbol in chunk:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if symbol not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[symbol]
+            elif len(chunk) == 1:
+                df = raw
+            else:
+                continue
+            # the batch frame is the union of all dates; drop rows this symbol lacks
+            df = df.dropna(how="all")
+            if not df.empty:
+                out[symbol] = _slim(df, keep=(SPLIT_COLUMN,) if keep_splits else ())
+    return out
+
+
+# corporate-action columns; only the cache's re-adjustment check looks at splits,
+# and only on incremental fetches (keep_splits)
+_DROP_COLUMNS = ["Dividends", "Stock Splits", "Capital Gains"]
+
+
+def _slim(df: pd.DataFrame, keep: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Drop unused columns (except `keep`) and store prices as float32 (half the
+    memory per frame). Volume stays as-is: float32 can't hold large share
+    counts exactly.
+    """
+    df = df.drop(columns=[c for c in _DROP_COLUMNS if c in df.columns and c not in keep])
+    prices = [c for c in df.select_dtypes("float64").columns if c != "Volume"]
+    return df.astype({c: np.float32 for c in prices}) if prices else df
+
+
+def _cache_path(symbol: str) -> Path:
+    return HISTORY_CACHE_DIR / f"{symbol}.parquet"
+
+
+def _read_cached(symbol: str) -> Tuple[Optional[pd.DataFrame], float]:
+    """Cached daily bars and the file's age in seconds; (None, inf) on a miss."""
+    path = _cache_path(symbol)
     try:
-        df = yf.Ticker(symbol).history(period=period, interval="1d", auto_adjust=False)
-        if df is None or df.empty:
-            return None
-        return df
+        age = time.time() - path.stat().st_mtime
+        df = pd.read_parquet(path)
+    except Exception:
+        return None, float("inf")
+    if df.empty:
+        return None, float("inf")
+    return _slim(df), age
+
+
+def _write_cached(symbol: str, df: pd.DataFrame) -> None:
+    path = _cache_path(symbol)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        HISTORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp)
+        tmp.replace(path)
     except Exception:
-        return None
+        tmp.unlink(missing_ok=True)
+
+
+def _trim_to_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    try:
+        cutoff = df.index[-1] - pd.Timedelta(period)
+    except ValueError:
+        return df
+    return df[df.index > cutoff]
+
+
+def _readjusted(cached: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+    """True if `fresh` (fetched from cached.index[-2] on) shows a split or disagrees on that settled bar."""
+    if SPLIT_COLUMN in fresh.columns and (fresh[SPLIT_COLUMN].fillna(0) != 0).any():
+        return True
+    if len(cached) < 2 or cached.index[-2] not in fresh.index:
+        return False
+    old = float(cached["Close"].iloc[-2])
+    new = float(fresh.at[cached.index[-2], "Close"])
+    return bool(np.isfinite(old) and np.isfinite(new) and not np.isclose(old, new, rtol=ADJUST_RTOL))
+
 
+def _store_full(frames: Dict[str, pd.DataFrame], out: Dict[str, pd.DataFrame]) -> None:
+    now = time.time()
+    for symbol, df in frames.items():
+        df.attrs[FULL_FETCH_ATTR] = now
+        _write_cached(symbol, df)
+        out[symbol] = df
 
-def scan_at_200dma(tickers: List[dict], tol: float = 0.003) -> List[ScanResult]:
+
+def _cached_histories(symbols: List[str], period: str) -> Dict[str, pd.DataFrame]:
+    out: Dict[str, pd.DataFrame] = {}
+    missing: List[str] = []
+    stale: Dict[object, List[str]] = {}  # overlap start date -> symbols
+    cached: Dict[str, pd.DataFrame] = {}
+
+    now = time.time()
+    for symbol in symbols:
+        df, age = _read_cached(symbol)
+        if df is None or now - df.attrs.get(FULL_FETCH_ATTR, 0) > HISTORY_CACHE_MAX_AGE:
+            missing.append(symbol)
+        elif age <= HISTORY_CACHE_TTL:
+            out[symbol] = df
+        else:
+            cached[symbol] = df
+            # start one bar before the last (which may have been partial) so the
+            # overlap includes a settled bar to check against
+            stale.setdefault(df.index[max(len(df) - 2, 0)].date(), []).append(symbol)
+
+    # warm but stale: fetch the tail and merge, unless the history was re-adjusted
+    for start, group in stale.items():
+        fresh = _download(group, keep_splits=True, start=start)
+        for symbol in group:
+            df = cached[symbol]
+            new = fresh.get(symbol)
+            if new is None:
+                out[symbol] = df
+                continue
+            if _readjusted(df, new):
+                missing.append(symbol)
+                continue
+            merged = pd.concat([df, new.drop(columns=[SPLIT_COLUMN], errors="ignore")])
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            merged.attrs = dict(df.attrs)
+            _write_cached(symbol, merged)
+            out[symbol] = merged
+
+    # cold, expired or re-adjusted symbols: full window, overwriting the file.
+    # A re-adjusted symbol whose refetch fails is left out rather than served wrong.
+    _store_full(_download(missing, period=period), out)
+
+    return {symbol: _trim_to_period(df, period) for symbol, df in out.items()}
+
+
+def fetch_histories(symbols: List[str], period: str = "420d", interval: str = "1d",
+                    columns: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
     """
-    Find tickers where last close is within ±tol of 200‑DMA.
-    tol=0.003 -> ±0.3% (default)
+    History for many symbols at once. Daily bars go through the on-disk cache;
+    other intervals are downloaded directly. Symbols with no data are omitted.
+    `columns` keeps only those fields (the cache itself stores full OHLCV).
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    todo: List[str] = []
+    with _HISTORY_MEMO_LOCK:
+        for symbol in symbols:
+            df = _HISTORY_MEMO.get((symbol, period, interval))
+            if df is None:
+                todo.append(symbol)
+            else:
+                frames[symbol] = df
+
+    if todo:
+        if interval == "1d":
+            fetched = _cached_histories(todo, period)
+        else:
+            fetched = _download(todo, interval=interval, period=period)
+        with _HISTORY_MEMO_LOCK:
+            for symbol, df in fetched.items():
+                _HISTORY_MEMO[(symbol, period, interval)] = df
+        frames.update(fetched)
+
+    if columns:
+        frames = {symbol: df[columns] for symbol, df in frames.items()}
+    return frames
+
+
+def fetch_history(symbol: str, period: str = "420d", columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    return fetch_histories([symbol], period=period, columns=columns).get(symbol)
+
+
+def _scan_columns(tickers: Sequence[UniverseTicker], tol: float) -> Dict[str, np.ndarray]:
     """
-    results: List[ScanResult] = []
+    The 200-DMA scan as parallel arrays (one entry per match, closest first),
+    keyed like the ScanResult fields.
+    """
+    frames = fetch_histories([tk.symbol for tk in tickers], columns=["Close"])
 
-    def worker(tk):
-        symbol = tk["symbol"]
-        name = tk.get("name", "")
-        in50 = tk.get("in_nifty50", False)
-        df = fetch_history(symbol)
+    # Stack the last 200 closes of every symbol with enough history into one
+    # (200, S) matrix so the SMA and distance are single column-wise ops.
+    # Frames hold float32; the matrix is float64 so the 200-bar mean stays exact.
+    picked = []
+    tails = []
+    for tk in tickers:
+        df = frames.get(tk.symbol)
         if df is None or df.shape[0] < 210:
-            return None
-        close = df["Close"].astype(float)
-        sma = close.rolling(200).mean()
-        last_close = float(close.iloc[-1])
-        last_sma = float(sma.iloc[-1])
-        if np.isnan(last_sma) or last_sma == 0:
-            return None
-        dist = (last_close - last_sma) / last_sma
-        if abs(dist) <= tol:
-            return ScanResult(
-                symbol=symbol,
-                name=name,
-                close=round(last_close, 2),
-                sma200=round(last_sma, 2),
-                distance_pct=float(round(dist * 100, 3)),
-                in_nifty50=in50,
-            )
-        return None
-
-    with ThreadPoolExecutor(max_workers=8) as ex:
-        futures = [ex.submit(worker, tk) for tk in tickers]
-        for fut in as_completed(futures):
-            res = fut.result()
-            if res:
-                results.append(res)
+            continue
+        picked.append(tk)
+        tails.append(df["Close"].to_numpy(dtype=np.float64)[-200:])
+
+    closes = np.stack(tails, axis=1) if tails else np.empty((200, 0))
+    last = closes[-1]
+    sma = closes.mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dist = (last - sma) / sma
+    # NaN in the window (or a zero SMA) leaves a non-finite distance
+    hit = np.flatnonzero(np.isfinite(dist) & (np.abs(dist) <= tol))
 
     # Sort by absolute distance (closest to 200DMA first)
-    return sorted(results, key=lambda r: abs(r.distance_pct))
\ No newline at end of file
+    dist_pct = np.round(dist[hit] * 100, 3)
+    order = np.argsort(np.abs(dist_pct), kind="stable")
+    idx = hit[order]
+    symbol = np.array([picked[i].symbol for i in idx], dtype=str)
+    in_nifty50 = np.array([picked[i].in_nifty50 for i in idx], dtype=bool)
+    base = np.char.replace(symbol, ".NS", "")
+    return {
+        "symbol": symbol,
+        "name": np.array([picked[i].name for i in idx], dtype=str),
+        "close": np.round(last[idx], 2),
+        "sma200": np.round(sma[idx], 2),
+        "distance_pct": dist_pct[order],
+        "in_nifty50": in_nifty50,
+        "base": base,
+        "display": np.char.add(base, np.where(in_nifty50, " (NIFTY50)", "")),
+    }
+
+
+def scan_at_200dma(tickers: Sequence[UniverseTicker], tol: float = 0.003) -> List[ScanResult]:
+    """
+    Find tickers where last close is within ±tol of 200‑DMA.
+    tol=0.003 -> ±0.3% (default)
+    """
+    cols = _scan_columns(tickers, tol)
+    return [ScanResult(*row) for row in zip(*(cols[f].tolist() for f in (
+        "symbol", "name", "close", "sma200", "distance_pct", "in_nifty50", "base", "display")))]
+
+
+def scan_at_200dma_records(tickers: Sequence[UniverseTicker], tol: float = 0.003,
+                           limit: Optional[int] = None) -> List[dict]:
+    """
+    scan_at_200dma as API rows (symbol, display, name, close, sma200,
+    distance_pct, in_nifty50, base), built column-wise rather than per result.
+    """
+    cols = _scan_columns(tickers, tol)
+    if limit is not None:
+        cols = {k: v[:limit] for k, v in cols.items()}
+    return pd.DataFrame({
+        "symbol": cols["symbol"],
+        "display": cols["display"],
+        "name": cols["name"],
+        "close": cols["close"],
+        "sma200": cols["sma200"],
+        "distance_pct": cols["distance_pct"],
+        "in_nifty50": cols["in_nifty50"],
+        "base": cols["base"],
+    }).to_dict("records")
@@ -1,17 +1,37 @@
 # screener/services_events.py
 from typing import List, Dict, Optional
+import asyncio
+import re
+import threading
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from django.core.cache import cache
+from .pools import enrich_pool, run_in_pool
 from datetime import datetime
 
 BASE = "https://www.nseindia.com"
 ANN_API = BASE + "/api/corporate-announcements"
 
+# concurrent announcement lookups in fetch_many_announcements, and the HTTP
+# connection pool size; the worker threads are pools.ENRICH_WORKERS
+FANOUT_LIMIT = 16
+
+# announcements change slowly; empty results (often NSE blocking us) expire sooner
+ANN_TTL = 10 * 60
+ANN_EMPTY_TTL = 60
+
+# headline keywords that flag a price-sensitive event; plain substring match,
+# so "Results" and "Board Meeting" both hit
+_SENSITIVE_RE = re.compile(r"result|earnings|board|dividend|conference|agm|egm", re.IGNORECASE)
+
+_SESS: Optional[requests.Session] = None
+_SESS_LOCK = threading.Lock()
+
 def _session() -> requests.Session:
     s = requests.Session()
     retry = Retry(total=3, backoff_factor=0.4, status_forcelist=[429, 500, 502, 503, 504])
-    s.mount("https://", HTTPAdapter(max_retries=retry))
+    s.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=FANOUT_LIMIT))
     s.headers.update({
         "User-Agent": "Mozilla/5.0",
         "Accept-Language": "en-IN,en;q=0.9",
@@ -22,11 +42,37 @@ def _session() -> requests.Session:
     s.get(BASE, timeout=6)
     return s
 
+def _get_session() -> requests.Session:
+    """Process-wide NSE session; the cookie warm-up runs once, not per call."""
+    global _SESS
+    if _SESS is None:
+        with _SESS_LOCK:
+            if _SESS is None:
+                _SESS = _session()
+    return _SESS
+
+def _reset_session() -> None:
+    global _SESS
+    with _SESS_LOCK:
+        _SESS = None
+
 def fetch_nse_announcements(nse_symbol_no_ns: str, limit: int = 6, timeout: float = 8.0) -> List[Dict]:
     """Latest corporate announcements for a given NSE symbol (e.g., 'ICICIBANK')."""
+    key = f"nse_ann:{nse_symbol_no_ns.upper()}:{limit}"
+    out = cache.get(key)
+    if out is not None:
+        return out
+    out = _fetch_nse_announcements(nse_symbol_no_ns, limit, timeout)
+    cache.set(key, out, ANN_TTL if out else ANN_EMPTY_TTL)
+    return out
+
+def _fetch_nse_announcements(nse_symbol_no_ns: str, limit: int, timeout: float) -> List[Dict]:
     try:
-        s = _session()
+        s = _get_session()
         r = s.get(ANN_API, params={"symbol": nse_symbol_no_ns.upper(), "index": "equities"}, timeout=timeout)
+        if r.status_code in (401, 403):
+            # cookies expired; re-warm on the next call
+            _reset_session()
         r.raise_for_status()
         data = r.json()
         rows = data.get("data") or data.get("rows") or data or []
@@ -42,14 +88,38 @@ def fetch_nse_announcements(nse_symbol_no_ns: str, limit: int = 6, timeout: floa
     except Exception:
         return []
 
+async def fetch_many_announcements(symbols: List[str], limit: int = 6, timeout: float = 8.0) -> List[List[Dict]]:
+    """
+    fetch_nse_announcements for many symbols concurrently over the shared session.
+    Results are in the same order as `symbols`.
+    """
+    sem = asyncio.Semaphore(FANOUT_LIMIT)
+
+    async def one(sym: str) -> List[Dict]:
+        async with sem:
+            return await run_in_pool(enrich_pool(), fetch_nse_announcements, sym, limit, timeout)
+
+    return list(await asyncio.gather(*(one(s) for s in symbols)))
+
+# DD-MMM-YYYY, DD-MMM-YY or DD/MM/YYYY (either separator is accepted)
+_DATE_RE = re.compile(r"^(\d{1,2})[-/](\d{1,2}|[A-Za-z]{3})[-/](\d{4}|\d{2})$")
+_MON = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+
 def _parse_dd_mmm_yyyy(d: Optional[str]) -> Optional[datetime]:
     if not d: return None
-    for fmt in ("%d-%b-%Y", "%d-%b-%y", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(d, fmt)
-        except Exception:
-            continue
-    return None
+    m = _DATE_RE.match(d)
+    if not m:
+        return None
+    day, mon, year = m.groups()
+    month = int(mon) if mon.isdigit() else _MON.get(mon.lower())
+    y = int(year)
+    if len(year) == 2:
+        y += 1900 if y >= 69 else 2000  # same pivot as strptime's %y
+    try:
+        return datetime(y, month, int(day)) if month else None
+    except ValueError:
+        return None
 
 def has_upcoming_event(ann_list: List[Dict], window_days: int = 7) -> Dict:
     """
@@ -57,13 +127,11 @@ def has_upcoming_event(ann_list: List[Dict], window_days: int = 7) -> Dict:
     Returns a summary with boolean and the nearest event info.
     """
     from datetime import datetime, timedelta
-    sensitive = ("result", "earnings", "board", "dividend", "conference", "agm", "egm")
     today = datetime.today()
     closest = None
 
     for a in ann_list:
-        text = (a.get("headline") or "").lower()
-        if not any(k in text for k in sensitive):
+        if not _SENSITIVE_RE.search(a.get("headline") or ""):
             continue
         dt = _parse_dd_mmm_yyyy(a.get("date"))
         if not dt:
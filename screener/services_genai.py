@@ -1,10 +1,27 @@
 # screener/services_genai.py
-import os, json
-from typing import Dict, Any
-from openai import OpenAI
+import os, json, asyncio, logging
+from typing import Dict, Any, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+
+log = logging.getLogger(__name__)
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Time bounds for the advise path. `timeout` is per attempt and the SDK retries
+# on top of it, so retries are capped; LLM_DEADLINE caps the whole batched call
+# (queueing, batch, re-batch and single fallbacks), and anything unfinished by
+# then gets the fail-soft plan. Callers size their cache locks from it.
+LLM_MAX_RETRIES = 1
+BATCH_TIMEOUT = 40.0   # seconds per batched request attempt
+SINGLE_TIMEOUT = 25.0  # seconds per single-symbol attempt
+LLM_DEADLINE = 120.0   # seconds for ask_llm_for_strategies_batch overall
+
+def _async_client() -> AsyncOpenAI:
+    # AsyncOpenAI's connection pool is bound to the event loop that first uses it.
+    # The async views await these calls on whatever loop serves the request, and
+    # under WSGI every request gets a fresh loop, so no client outlives one call.
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=LLM_MAX_RETRIES)
+
 # Strict JSON schema for structured output
 STRAT_SCHEMA = {
     "name": "StrategyAdvice",
@@ -84,6 +101,47 @@ Rules:
 - Keep strikes near sensible round levels (near spot or spot +/- ATR-based width).
 - Avoid promises; include risk notes."""
 
+# Several symbols per request: the shared system prompt and schema are sent
+# once per batch instead of once per symbol. Plan quality drops once a batch
+# gets long, so batches are packed by estimated tokens (prompt line + reply)
+# as well as by count.
+MAX_BATCH_ITEMS = 8
+MAX_BATCH_TOKENS = 4000
+PLAN_TOKENS = 350  # rough size of one plan in the reply
+
+BATCH_SCHEMA = {
+    "name": "StrategyAdviceBatch",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "plans": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "index": {"type": "integer"},
+                        "plan": STRAT_SCHEMA["schema"],
+                    },
+                    "required": ["index","plan"]
+                }
+            }
+        },
+        "required": ["plans"]
+    }
+}
+
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+You will receive several stocks labelled Stock[1]..Stock[n]. Treat each one independently.
+Return {"plans": [...]} with exactly one entry per stock: {"index": i, "plan": {...}}, where i is the stock's number."""
+
+# Provider-side prompt caching: OpenAI reuses a cached prefix when requests start
+# with identical tokens. Everything static (system prompt, schema) goes first and
+# only the user message varies; the cache key routes both request shapes to
+# warm caches.
+PROMPT_CACHE_KEY = "dma200-strategy-v1"
+BATCH_PROMPT_CACHE_KEY = "dma200-strategy-batch-v1"
+
 def build_user_prompt(symbol: str, base: str, ctx: Dict[str, Any]) -> str:
     # ctx will have: close, sma200, distance_pct, signals{rsi, atr_pct, slope20, slope200}, 
     # in_nifty50, event_window_hit(bool), risk_per_trade_pct(float), capital(float), prefer_credit(bool)
@@ -102,41 +160,168 @@ def build_user_prompt(symbol: str, base: str, ctx: Dict[str, Any]) -> str:
         "expiry_hint": ctx.get("expiry_hint", "near-month"),
     }, ensure_ascii=False)
 
+def _strategy_request(symbol: str, base: str, ctx: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    return dict(
+        model="gpt-4o-mini",
+        temperature=0.2,
+        response_format={"type":"json_schema","json_schema":{"name":STRAT_SCHEMA["name"],"schema":STRAT_SCHEMA["schema"]}},
+        messages=[
+            {"role":"system","content": SYSTEM_PROMPT},
+            {"role":"user","content": build_user_prompt(symbol, base, ctx)}
+        ],
+        extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
+        timeout=timeout,
+    )
+
+def build_batch_prompt(items: List[Tuple[str, str, Dict[str, Any]]]) -> str:
+    return "\n".join(
+        f"Stock[{i}]: {build_user_prompt(symbol, base, ctx)}"
+        for i, (symbol, base, ctx) in enumerate(items, start=1)
+    )
+
+def _estimate_tokens(item: Tuple[str, str, Dict[str, Any]]) -> int:
+    # ~4 chars per token for JSON-ish English; good enough for packing
+    symbol, base, ctx = item
+    return len(build_user_prompt(symbol, base, ctx)) // 4 + PLAN_TOKENS
+
+def pack_batches(items: List[Tuple[str, str, Dict[str, Any]]], max_items: int = MAX_BATCH_ITEMS,
+                 max_tokens: int = MAX_BATCH_TOKENS) -> List[List[Tuple[str, str, Dict[str, Any]]]]:
+    """Greedily split `items` (in order) into batches under both limits; every batch has at least one item."""
+    batches, cur, cur_tokens = [], [], 0
+    for item in items:
+        t = _estimate_tokens(item)
+        if cur and (len(cur) >= max_items or cur_tokens + t > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(item)
+        cur_tokens += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+def _batch_request(items: List[Tuple[str, str, Dict[str, Any]]], timeout: float) -> Dict[str, Any]:
+    return dict(
+        model="gpt-4o-mini",
+        temperature=0.2,
+        response_format={"type":"json_schema","json_schema":{"name":BATCH_SCHEMA["name"],"schema":BATCH_SCHEMA["schema"]}},
+        messages=[
+            {"role":"system","content": BATCH_SYSTEM_PROMPT},
+            {"role":"user","content": build_batch_prompt(items)}
+        ],
+        extra_body={"prompt_cache_key": BATCH_PROMPT_CACHE_KEY},
+        timeout=timeout,
+    )
+
+def _fallback_plan(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    # Fail-soft minimal shape
+    return {
+        "bias":"NEUTRAL","confidence":2,
+        "rationale":"Fallback: LLM unavailable.",
+        "entry_plan":{"entry_type":"MARKET","entry_level":ctx["close"],"conditions":"None"},
+        "stop_loss":{"stop_type":"ATR_MULTIPLE","stop_level":1.2,"notes":"Fallback"},
+        "exit_targets":[{"target_type":"RR_MULTIPLE","target_level":2.0,"scale_out_pct":50}],
+        "risk_reward":{"est_rr":1.5,"risk_per_trade_pct": ctx.get("risk_per_trade_pct",1.0), "position_size_hint":"Fallback"},
+        "options_strategy":{"name":"Iron Condor","legs":[],"why_this":"Fallback","max_loss_note":"Fallback","breakeven_hint":"Fallback"},
+        "risk_notes":"Use tiny size until LLM available."
+    }
+
 def ask_llm_for_strategy(symbol: str, base: str, ctx: Dict[str, Any], timeout: float = 20.0) -> Dict[str, Any]:
     """
     Returns a dict following STRAT_SCHEMA. Fails-soft to a minimal neutral plan if LLM errors.
     """
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.2,
-            response_format={"type":"json_schema","json_schema":{"name":STRAT_SCHEMA["name"],"schema":STRAT_SCHEMA["schema"]}},
-            messages=[
-                {"role":"system","content": SYSTEM_PROMPT},
-                {"role":"user","content": build_user_prompt(symbol, base, ctx)}
-            ],
-            timeout=timeout,
-        )
+        resp = client.chat.completions.create(**_strategy_request(symbol, base, ctx, timeout))
+        text = resp.choices[0].message.content
+        return json.loads(text)
+    except Exception:
+        return _fallback_plan(ctx)
+
+async def ask_llm_for_strategy_async(symbol: str, base: str, ctx: Dict[str, Any], timeout: float = 20.0,
+                                     aclient: Optional[AsyncOpenAI] = None) -> Dict[str, Any]:
+    """Async ask_llm_for_strategy; pass `aclient` to share one client across a batch."""
+    try:
+        if aclient is None:
+            async with _async_client() as own:
+                resp = await own.chat.completions.create(**_strategy_request(symbol, base, ctx, timeout))
+        else:
+            resp = await aclient.chat.completions.create(**_strategy_request(symbol, base, ctx, timeout))
         text = resp.choices[0].message.content
         return json.loads(text)
     except Exception:
-        # Fail-soft minimal shape
-        return {
-            "bias":"NEUTRAL","confidence":2,
-            "rationale":"Fallback: LLM unavailable.",
-            "entry_plan":{"entry_type":"MARKET","entry_level":ctx["close"],"conditions":"None"},
-            "stop_loss":{"stop_type":"ATR_MULTIPLE","stop_level":1.2,"notes":"Fallback"},
-            "exit_targets":[{"target_type":"RR_MULTIPLE","target_level":2.0,"scale_out_pct":50}],
-            "risk_reward":{"est_rr":1.5,"risk_per_trade_pct": ctx.get("risk_per_trade_pct",1.0), "position_size_hint":"Fallback"},
-            "options_strategy":{"name":"Iron Condor","legs":[],"why_this":"Fallback","max_loss_note":"Fallback","breakeven_hint":"Fallback"},
-            "risk_notes":"Use tiny size until LLM available."
-        }
+        return _fallback_plan(ctx)
+
+async def _ask_batch_chunk(aclient: AsyncOpenAI, chunk: List[Tuple[str, str, Dict[str, Any]]],
+                           timeout: float) -> List[Optional[Dict[str, Any]]]:
+    """One batched request; None marks an index the reply didn't cover (or was malformed)."""
+    plans: List[Optional[Dict[str, Any]]] = [None] * len(chunk)
+    try:
+        resp = await aclient.chat.completions.create(**_batch_request(chunk, timeout))
+        data = json.loads(resp.choices[0].message.content)
+        for entry in data.get("plans") or []:
+            i = entry.get("index")
+            if isinstance(i, int) and 1 <= i <= len(chunk) and isinstance(entry.get("plan"), dict):
+                plans[i - 1] = entry["plan"]
+    except Exception:
+        pass
+    return plans
+
+async def ask_llm_for_strategies_batch(items: List[Tuple[str, str, Dict[str, Any]]],
+                                       max_items: int = MAX_BATCH_ITEMS, max_tokens: int = MAX_BATCH_TOKENS,
+                                       concurrency: int = 2, batch_timeout: float = BATCH_TIMEOUT,
+                                       single_timeout: float = SINGLE_TIMEOUT,
+                                       deadline: float = LLM_DEADLINE) -> List[Dict[str, Any]]:
+    """
+    Strategy plans for many (symbol, base, ctx) items, packed into prompts of at
+    most `max_items` symbols / `max_tokens` estimated tokens, with at most
+    `concurrency` prompts in flight. Items a batched reply leaves out are
+    retried once as a smaller batch, then one symbol per request. Whatever
+    isn't planned within `deadline` seconds gets the fallback plan.
+    Plans come back in the order of `items`.
+    """
+    plans: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    sem = asyncio.Semaphore(concurrency)
+    try:
+        aclient = _async_client()
+    except Exception:
+        return [_fallback_plan(ctx) for _, _, ctx in items]
+    async with aclient:
+        async def _single(i):
+            symbol, base, ctx = items[i]
+            async with sem:
+                plans[i] = await ask_llm_for_strategy_async(symbol, base, ctx, timeout=single_timeout, aclient=aclient)
+
+        async def _solve(idx, rebatch=True):
+            async with sem:
+                got = await _ask_batch_chunk(aclient, [items[i] for i in idx], batch_timeout)
+            for i, plan in zip(idx, got):
+                plans[i] = plan
+            missing = [i for i in idx if plans[i] is None]
+            if not missing:
+                return
+            log.warning("LLM batch of %d returned %d plans; retrying %d",
+                        len(idx), len(idx) - len(missing), len(missing))
+            # a partial reply gets one more, smaller batch; anything still
+            # missing (or a reply that covered nothing) goes one by one
+            if rebatch and 1 < len(missing) < len(idx):
+                await _solve(missing, rebatch=False)
+            else:
+                await asyncio.gather(*[_single(i) for i in missing])
+
+        groups, pos = [], 0
+        for batch in pack_batches(items, max_items, max_tokens):
+            groups.append(list(range(pos, pos + len(batch))))
+            pos += len(batch)
+        log.info("LLM batches for %d items: sizes %s", len(items), [len(g) for g in groups])
+        try:
+            await asyncio.wait_for(asyncio.gather(*[_solve(g) for g in groups]), deadline)
+        except asyncio.TimeoutError:
+            log.warning("LLM plans hit the %gs deadline; %d of %d unplanned",
+                        deadline, sum(p is None for p in plans), len(items))
+    return [plan if plan is not None else _fallback_plan(ctx) for plan, (_, _, ctx) in zip(plans, items)]
 
 def llm_health():
     info = {"env_key_present": bool(os.getenv("OPENAI_API_KEY")), "models_ok": False, "chat_ok": False, "error": None}
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         client.models.list()        # lightweight check
         info["models_ok"] = True
         client.chat.completions.create(
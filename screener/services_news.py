@@ -1,11 +1,25 @@
 # screener/services_news.py
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from urllib.parse import quote_plus
+import asyncio
 import feedparser
 import requests
+from requests.adapters import HTTPAdapter
+from django.core.cache import cache
+from .pools import enrich_pool, run_in_pool
+
+# concurrent feed fetches in fetch_many_news, and the HTTP connection pool
+# size; the worker threads are pools.ENRICH_WORKERS
+FANOUT_LIMIT = 16
+
+# feeds move at minute granularity; empty results (usually an outage) expire
+# sooner so we neither hammer Google nor sit on a blank for long
+NEWS_TTL = 5 * 60
+NEWS_EMPTY_TTL = 60
 
 # ➊ one reusable session with timeouts/retries
 _session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=FANOUT_LIMIT))
 _session.headers.update({
     "User-Agent": "Mozilla/5.0",
     "Accept": "application/rss+xml, application/xml;q=0.9, */*;q=0.8",
@@ -18,8 +32,17 @@ def _company_query(symbol: str, name: str) -> str:
 def fetch_google_news(symbol: str, name: str, limit: int = 6, timeout: float = 6.0) -> List[Dict]:
     """
     Robust: fetch RSS with requests (timeout), then parse.
-    Returns [] on any error.
+    Returns [] on any error. Results are cached per (symbol, name, limit).
     """
+    key = f"news:{symbol}:{quote_plus(name or '')}:{limit}"
+    items = cache.get(key)
+    if items is not None:
+        return items
+    items = _fetch_google_news(symbol, name, limit, timeout)
+    cache.set(key, items, NEWS_TTL if items else NEWS_EMPTY_TTL)
+    return items
+
+def _fetch_google_news(symbol: str, name: str, limit: int, timeout: float) -> List[Dict]:
     try:
         q = _company_query(symbol, name)
         rss_url = f"https://news.google.com/rss/search?q={quote_plus(q)}&hl=en-IN&gl=IN&ceid=IN:en"
@@ -46,3 +69,16 @@ def fetch_google_news(symbol: str, name: str, limit: int = 6, timeout: float = 6
         return items
     except Exception:
         return []
+
+async def fetch_many_news(items: List[Tuple[str, str]], limit: int = 6, timeout: float = 6.0) -> List[List[Dict]]:
+    """
+    fetch_google_news for many (symbol, name) pairs concurrently.
+    Results are in the same order as `items`.
+    """
+    sem = asyncio.Semaphore(FANOUT_LIMIT)
+
+    async def one(symbol: str, name: str) -> List[Dict]:
+        async with sem:
+            return await run_in_pool(enrich_pool(), fetch_google_news, symbol, name, limit, timeout)
+
+    return list(await asyncio.gather(*(one(s, n) for s, n in items)))
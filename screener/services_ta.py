@@ -1,33 +1,38 @@
 # screener/services_ta.py
-from typing import Dict
+from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator
-from ta.volatility import AverageTrueRange
+from ._ta_kernels import signals_kernel
+from .pools import cpu_pool
 
 def compute_signals(df: pd.DataFrame) -> Dict:
-    close = df["Close"].astype(float)
-    high = df["High"].astype(float)
-    low = df["Low"].astype(float)
+    bars = df[["Close", "High", "Low"]].dropna()
+    close = np.ascontiguousarray(bars["Close"].to_numpy(), dtype=np.float32)
+    high = np.ascontiguousarray(bars["High"].to_numpy(), dtype=np.float32)
+    low = np.ascontiguousarray(bars["Low"].to_numpy(), dtype=np.float32)
 
-    rsi = float(RSIIndicator(close, window=14).rsi().iloc[-1])
-    atr = AverageTrueRange(high, low, close, window=14).average_true_range().iloc[-1]
-    last = float(close.iloc[-1]) if len(close) else 0.0
-    atr_pct = float(round(100 * atr / last, 2)) if last else 0.0
-
-    sma20 = close.rolling(20).mean()
-    sma200 = close.rolling(200).mean()
-
-    def slope(series, lookback=5):
-        y = series.dropna().iloc[-lookback:]
-        if len(y) < lookback: return 0.0
-        x = np.arange(len(y))
-        m = np.polyfit(x, y, 1)[0]
-        return float(m / (y.iloc[-1] if y.iloc[-1] else 1.0))
+    rsi, atr_pct, slope20, slope200 = signals_kernel(close, high, low)
 
     return {
         "rsi": round(rsi, 1),
-        "atr_pct": atr_pct,
-        "slope20": round(100 * slope(sma20), 3),
-        "slope200": round(100 * slope(sma200), 3),
+        "atr_pct": float(round(atr_pct, 2)),
+        "slope20": round(100 * slope20, 3),
+        "slope200": round(100 * slope200, 3),
     }
+
+def _signals_or_none(df: pd.DataFrame) -> Optional[Dict]:
+    try:
+        return compute_signals(df)
+    except Exception:
+        return None
+
+def compute_signals_many(frames: List[pd.DataFrame]) -> List[Optional[Dict]]:
+    """
+    compute_signals for many frames, in order; None where a frame couldn't be
+    scored, so one bad history doesn't sink the batch. signals_kernel releases
+    the GIL, so the shared cpu pool spreads the work over cores without
+    pickling the arrays.
+    """
+    if len(frames) < 2:
+        return [_signals_or_none(df) for df in frames]
+    return list(cpu_pool().map(_signals_or_none, frames))
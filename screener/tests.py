@@ -1,3 +1,316 @@
-from django.test import TestCase
+import threading
+import time
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import services
+from .cache_utils import SingleFlightTimeout, cache_single_flight
+from .params import get_bool, get_float, get_int, is_true
+from .responses import _not_modified
+from .services_events import _parse_dd_mmm_yyyy
+from .services_genai import _estimate_tokens, pack_batches
+
+
+class ParamsTests(SimpleTestCase):
+    def setUp(self):
+        self.rf = RequestFactory()
+
+    def get(self, **params):
+        return self.rf.get("/api/scan", params)
+
+    def test_get_float(self):
+        self.assertEqual(get_float(self.get(), "tol", 0.003), 0.003)
+        self.assertEqual(get_float(self.get(tol="0.01"), "tol", 0.003), 0.01)
+        self.assertEqual(get_float(self.get(tol=".5"), "tol", 0.003), 0.5)
+        self.assertEqual(get_float(self.get(tol="1e-3"), "tol", 0.003), 0.001)
+        self.assertEqual(get_float(self.get(tol="-2"), "tol", 0.003), -2.0)
+        for bad in ("abc", "", "nan", "inf", "1e400", "-1e400", "1.2.3"):
+            with self.subTest(bad=bad):
+                self.assertEqual(get_float(self.get(tol=bad), "tol", 0.003), 0.003)
+
+    def test_get_int(self):
+        self.assertEqual(get_int(self.get(), "max", 20), 20)
+        self.assertEqual(get_int(self.get(max="5"), "max", 20), 5)
+        self.assertEqual(get_int(self.get(max="5.0"), "max", 20), 5)
+        self.assertEqual(get_int(self.get(max="7.9"), "max", 20), 7)
+        for bad in ("x", "", "1e400", "inf", "nan"):
+            with self.subTest(bad=bad):
+                self.assertEqual(get_int(self.get(max=bad), "max", 20), 20)
+
+    def test_is_true(self):
+        for v in ("1", "true", "True", "YES", " yes ", "on", "y"):
+            with self.subTest(v=v):
+                self.assertTrue(is_true(v))
+        for v in (None, "", "0", "false", "no", "off", "2"):
+            with self.subTest(v=v):
+                self.assertFalse(is_true(v))
+
+    def test_get_bool(self):
+        self.assertFalse(get_bool(self.get(), "prefer_credit"))
+        self.assertTrue(get_bool(self.get(), "prefer_credit", default=True))
+        self.assertTrue(get_bool(self.get(prefer_credit="1"), "prefer_credit"))
+        self.assertFalse(get_bool(self.get(prefer_credit="0"), "prefer_credit", default=True))
+
+
+class ParseDateTests(SimpleTestCase):
+    def test_formats(self):
+        self.assertEqual(_parse_dd_mmm_yyyy("05-Mar-2024"), datetime(2024, 3, 5))
+        self.assertEqual(_parse_dd_mmm_yyyy("5-mar-24"), datetime(2024, 3, 5))
+        self.assertEqual(_parse_dd_mmm_yyyy("05/03/2024"), datetime(2024, 3, 5))
+        self.assertEqual(_parse_dd_mmm_yyyy("05-03/2024"), datetime(2024, 3, 5))
+        self.assertEqual(_parse_dd_mmm_yyyy("01-Jan-69"), datetime(1969, 1, 1))
+        self.assertEqual(_parse_dd_mmm_yyyy("01-Jan-68"), datetime(2068, 1, 1))
+
+    def test_invalid(self):
+        for bad in (None, "", "2024-03-05", "31-Feb-2024", "05-Foo-2024", "05/13/2024", "05-Mar-2024 10:00"):
+            with self.subTest(bad=bad):
+                self.assertIsNone(_parse_dd_mmm_yyyy(bad))
+
+
+def _item(i, pad=0):
+    ctx = {"close": 100.0, "sma200": 100.0, "distance_pct": 0.0, "signals": {"note": "x" * pad}}
+    return (f"S{i}.NS", f"S{i}", ctx)
+
+
+class PackBatchesTests(SimpleTestCase):
+    def test_empty(self):
+        self.assertEqual(pack_batches([]), [])
+
+    def test_item_limit_keeps_order(self):
+        items = [_item(i) for i in range(20)]
+        batches = pack_batches(items, max_items=8, max_tokens=10 ** 9)
+        self.assertEqual([len(b) for b in batches], [8, 8, 4])
+        self.assertEqual([x for b in batches for x in b], items)
+
+    def test_token_limit(self):
+        items = [_item(i) for i in range(6)]
+        # each item costs PLAN_TOKENS + prompt; a budget just over two items packs pairs
+        budget = 2 * _estimate_tokens(items[0]) + 1
+        self.assertEqual([len(b) for b in pack_batches(items, max_items=8, max_tokens=budget)], [2, 2, 2])
+
+    def test_oversized_item_gets_its_own_batch(self):
+        items = [_item(0), _item(1, pad=40000), _item(2)]
+        self.assertEqual([len(b) for b in pack_batches(items, max_items=8, max_tokens=4000)], [1, 1, 1])
+
+
+class _SlowTicker:
+    """Stands in for yfinance.multi.Ticker: each history() takes a little while."""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, **kwargs):
+        time.sleep(0.02)
+        idx = pd.bdate_range("2024-01-01", periods=5)
+        return pd.DataFrame({"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0,
+                             "Adj Close": 1.0, "Volume": 1.0}, index=idx)
+
+
+class DownloadConcurrencyTests(SimpleTestCase):
+    def test_overlapping_downloads_each_get_all_symbols(self):
+        results = {}
+        groups = {"a": [f"A{i}.NS" for i in range(20)], "b": [f"B{i}.NS" for i in range(20)]}
+
+        def run(name):
+            results[name] = services._download(groups[name], period="1mo")
+
+        with mock.patch("yfinance.multi.Ticker", _SlowTicker):
+            threads = {name: threading.Thread(target=run, args=(name,), daemon=True) for name in groups}
+            threads["a"].start()
+            time.sleep(0.03)  # start the second while the first is mid-download
+            threads["b"].start()
+            for t in threads.values():
+                t.join(10)
+
+        for name, t in threads.items():
+            self.assertFalse(t.is_alive(), f"download {name} hung")
+            self.assertEqual(sorted(results[name]), sorted(groups[name]))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                       "LOCATION": "single-flight-tests"}})
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        async def producer():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return {"v": 1}
+
+        async def main():
+            return await asyncio.gather(*[cache_single_flight("sf:once", 60, producer, poll=0.01)
+                                          for _ in range(5)])
+
+        self.assertEqual(asyncio.run(main()), [{"v": 1}] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_expired_wait_raises_instead_of_recomputing(self):
+        calls = []
+
+        async def producer():
+            calls.append(1)
+            await asyncio.sleep(0.5)
+            return {"v": 1}
+
+        async def main():
+            holder = asyncio.create_task(cache_single_flight("sf:slow", 60, producer, poll=0.01))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(SingleFlightTimeout):
+                await cache_single_flight("sf:slow", 60, producer, wait=0.1, poll=0.01)
+            return await holder
+
+        self.assertEqual(asyncio.run(main()), {"v": 1})
+        self.assertEqual(len(calls), 1)
+
+    def test_waiter_takes_over_when_holder_fails(self):
+        async def failing():
+            await asyncio.sleep(0.1)
+            raise RuntimeError("boom")
+
+        async def ok():
+            return {"v": 2}
+
+        async def main():
+            holder = asyncio.create_task(cache_single_flight("sf:fail", 60, failing, poll=0.01))
+            await asyncio.sleep(0.02)
+            got = await cache_single_flight("sf:fail", 60, ok, wait=5, poll=0.01)
+            with self.assertRaises(RuntimeError):
+                await holder
+            return got
+
+        self.assertEqual(asyncio.run(main()), {"v": 2})
+
+
+def _bars(start="2024-01-01", periods=300, close=None, splits=None):
+    idx = pd.bdate_range(start, periods=periods)
+    c = np.linspace(100, 200, periods, dtype=np.float32) if close is None else np.asarray(close, np.float32)
+    df = pd.DataFrame({"Open": c, "High": c, "Low": c, "Close": c, "Volume": 1e6}, index=idx)
+    if splits is not None:
+        df[services.SPLIT_COLUMN] = np.float32(0.0)
+        for day, ratio in splits.items():
+            df.loc[pd.Timestamp(day), services.SPLIT_COLUMN] = ratio
+    return df
+
+
+class HistoryCacheTests(SimpleTestCase):
+    """_cached_histories against a stubbed _download and a temp cache dir."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(services, "HISTORY_CACHE_DIR", Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+        self.full = _bars()          # what a full-period download returns
+        self.tail = None             # what an incremental (start=...) download returns
+        patcher = mock.patch.object(services, "_download", self.fake_download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_download(self, symbols, interval="1d", keep_splits=False, **window):
+        if not symbols:  # the real one makes no request either
+            return {}
+        self.calls.append(("start" if "start" in window else "period", window))
+        if "start" in window:
+            if self.tail is None:
+                return {}
+            df = self.tail[self.tail.index >= pd.Timestamp(window["start"])]
+            return {s: df for s in symbols}
+        return {s: self.full.copy() for s in symbols} if self.full is not None else {}
+
+    def cache(self, df, age=0.0, full_fetch_age=0.0, attrs=True):
+        df = df.copy()
+        if attrs:
+            df.attrs[services.FULL_FETCH_ATTR] = time.time() - full_fetch_age
+        services._write_cached("A.NS", df)
+        when = time.time() - age
+        os.utime(services._cache_path("A.NS"), (when, when))
+
+    def stale_age(self):
+        return services.HISTORY_CACHE_TTL + 60
+
+    def test_fresh_file_is_served_without_download(self):
+        self.cache(_bars(periods=250))
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertEqual(self.calls, [])
+        self.assertEqual(len(out["A.NS"]), 250)
+
+    def test_stale_file_merges_its_tail(self):
+        cached = _bars(periods=250)
+        self.cache(cached, age=self.stale_age())
+        # same prices up to the cached end, plus 3 new bars; overlap starts at the settled bar
+        self.tail = _bars(periods=253, close=np.r_[cached["Close"].to_numpy(), 201, 202, 203], splits={})
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertEqual(self.calls, [("start", {"start": cached.index[-2].date()})])
+        self.assertEqual(len(out["A.NS"]), 253)
+        self.assertNotIn(services.SPLIT_COLUMN, out["A.NS"].columns)
+        on_disk, _ = services._read_cached("A.NS")
+        self.assertEqual(len(on_disk), 253)
+
+    def test_split_in_tail_triggers_full_refetch(self):
+        cached = _bars(periods=250)
+        self.cache(cached, age=self.stale_age())
+        self.tail = _bars(periods=252, close=np.r_[cached["Close"].to_numpy(), 201, 202],
+                          splits={cached.index[-1]: 2.0})
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertEqual([kind for kind, _ in self.calls], ["start", "period"])
+        self.assertEqual(len(out["A.NS"]), len(services._trim_to_period(self.full, "420d")))
+        on_disk, _ = services._read_cached("A.NS")
+        self.assertEqual(len(on_disk), len(self.full))
+
+    def test_moved_settled_close_triggers_full_refetch(self):
+        cached = _bars(periods=250)
+        self.cache(cached, age=self.stale_age())
+        self.tail = _bars(periods=252, close=np.linspace(100, 200, 252) / 2, splits={})  # back-adjusted 2:1
+        self.full = _bars(close=np.linspace(50, 100, 300))
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertEqual([kind for kind, _ in self.calls], ["start", "period"])
+        self.assertAlmostEqual(float(out["A.NS"]["Close"].iloc[-1]), 100.0, places=3)
+
+    def test_failed_refetch_drops_the_symbol(self):
+        cached = _bars(periods=250)
+        self.cache(cached, age=self.stale_age())
+        self.tail = _bars(periods=252, close=np.r_[cached["Close"].to_numpy(), 201, 202],
+                          splits={cached.index[-1]: 2.0})
+        self.full = None
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertNotIn("A.NS", out)
+
+    def test_missing_full_fetch_attr_forces_full_fetch(self):
+        self.cache(_bars(periods=250), attrs=False)
+        out = services._cached_histories(["A.NS"], "420d")
+        self.assertEqual([kind for kind, _ in self.calls], ["period"])
+        self.assertIn(services.FULL_FETCH_ATTR, services._read_cached("A.NS")[0].attrs)
+        self.assertIn("A.NS", out)
+
+    def test_expired_full_fetch_forces_full_fetch(self):
+        self.cache(_bars(periods=250), full_fetch_age=services.HISTORY_CACHE_MAX_AGE + 60)
+        services._cached_histories(["A.NS"], "420d")
+        self.assertEqual([kind for kind, _ in self.calls], ["period"])
+
+
+class NotModifiedTests(SimpleTestCase):
+    def check(self, inm, etag='"abc-gzip"'):
+        return _not_modified(RequestFactory().get("/", HTTP_IF_NONE_MATCH=inm), etag, time.time())
+
+    def test_if_none_match(self):
+        self.assertTrue(self.check('"abc-gzip"'))
+        self.assertTrue(self.check('"x", W/"abc-gzip"'))  # weak comparison
+        self.assertTrue(self.check("*"))
+        self.assertFalse(self.check('"abc"'))
+        self.assertFalse(self.check('"abc-gzip-br"'))
+
+    def test_if_none_match_wins_over_if_modified_since(self):
+        req = RequestFactory().get("/", HTTP_IF_NONE_MATCH='"other"',
+                                   HTTP_IF_MODIFIED_SINCE="Wed, 14 Oct 2099 00:00:00 GMT")
+        self.assertFalse(_not_modified(req, '"abc"', time.time()))
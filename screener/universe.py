@@ -0,0 +1,61 @@
+# screener/universe.py
+"""
+Process-local snapshot of the Ticker universe. It changes at most daily, so the
+views scan an immutable cached tuple instead of re-querying on every cache miss.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Ticker
+
+UNIVERSE_TTL = 60 * 60  # seconds
+
+_expiry = 0.0
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class UniverseTicker:
+    symbol: str
+    name: str
+    in_nifty50: bool
+
+
+@lru_cache(maxsize=1)
+def _load_universe() -> Tuple[UniverseTicker, ...]:
+    # plain row tuples, streamed in chunks: no per-row dict and no full
+    # result list materialized next to the snapshot
+    rows = Ticker.objects.values_list("symbol", "name", "in_nifty50").iterator(chunk_size=2000)
+    return tuple(UniverseTicker(*row) for row in rows)
+
+
+def get_universe_cached() -> Tuple[UniverseTicker, ...]:
+    """The cached universe, reloaded from the DB once UNIVERSE_TTL has passed."""
+    global _expiry
+    with _lock:
+        now = time.monotonic()
+        if now >= _expiry:
+            _load_universe.cache_clear()
+            _expiry = now + UNIVERSE_TTL
+        return _load_universe()
+
+
+def invalidate_universe() -> None:
+    global _expiry
+    with _lock:
+        _load_universe.cache_clear()
+        _expiry = 0.0
+
+
+# bulk_create/bulk_update don't send these; callers doing bulk writes in this
+# process call invalidate_universe() themselves
+@receiver(post_save, sender=Ticker)
+@receiver(post_delete, sender=Ticker)
+def _ticker_changed(sender, **kwargs):
+    invalidate_universe()
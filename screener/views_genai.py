@@ -1,61 +1,79 @@
 # screener/views_genai.py
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from django.http import JsonResponse
-from django.core.cache import cache
-from .models import Ticker
-from .services import scan_at_200dma, fetch_history
-from .services_ta import compute_signals
-from .services_genai import ask_llm_for_strategy
-from .services_events import fetch_nse_announcements, has_upcoming_event  # if you added events
+import asyncio
+from asgiref.sync import sync_to_async
+from .params import get_bool, get_float, get_int
+from .pools import run_in_pool, view_pool
+from .responses import ORJsonResponse, etag_cached_json
+from .universe import get_universe_cached
+from .services import scan_at_200dma, fetch_histories
+from .services_ta import compute_signals_many
+from .services_genai import LLM_DEADLINE, ask_llm_for_strategies_batch
+from .views import SCAN_LOCK_TIMEOUT
+from .services_events import fetch_many_announcements, has_upcoming_event
 from .services_genai import llm_health
 
-def api_advise_llm(request):
+# LLM batches are slow; hold the single-flight lock past the worst case so
+# concurrent misses never double the spend: the scan's own bound plus the LLM
+# phase (capped at LLM_DEADLINE). Waiters with no stale copy get a 503 after
+# ADVISE_WAIT instead of recomputing.
+ADVISE_LOCK_TIMEOUT = SCAN_LOCK_TIMEOUT + int(LLM_DEADLINE)
+ADVISE_WAIT = 120.0
+
+
+@etag_cached_json(ttl=30 * 60, lock_timeout=ADVISE_LOCK_TIMEOUT, wait=ADVISE_WAIT)
+async def api_advise_llm(request):
     # read params
-    try: tol = float(request.GET.get("tol", 0.003))
-    except ValueError: tol = 0.003
-    try: max_matches = int(request.GET.get("max", 8))
-    except ValueError: max_matches = 8
-    try: event_window = int(request.GET.get("event_window", 7))
-    except ValueError: event_window = 7
+    tol = get_float(request, "tol", 0.003)
+    max_matches = get_int(request, "max", 8)
+    event_window = get_int(request, "event_window", 7)
 
     # optional risk config for the prompt
-    try: risk_per_trade_pct = float(request.GET.get("risk_pct", 1.0))
-    except ValueError: risk_per_trade_pct = 1.0
+    risk_per_trade_pct = get_float(request, "risk_pct", 1.0)
     capital = request.GET.get("capital")  # string -> keep as number if you want
-    prefer_credit = (request.GET.get("prefer_credit","0") in ("1","true","True"))
+    prefer_credit = get_bool(request, "prefer_credit")
 
     cache_key = f"advise_llm_tol_{tol:.4f}_max_{max_matches}_ew_{event_window}_rp_{risk_per_trade_pct}_pc_{prefer_credit}_{capital}"
-    cached = cache.get(cache_key)
-    if cached:
-        return JsonResponse(cached, safe=False)
+    return cache_key, lambda: _advise_payload(tol, max_matches, event_window, risk_per_trade_pct, capital, prefer_credit)
+
 
+async def _advise_payload(tol, max_matches, event_window, risk_per_trade_pct, capital, prefer_credit):
     # 1) base matches
-    universe = list(Ticker.objects.values("symbol","name","in_nifty50"))
-    matches = scan_at_200dma(universe, tol=tol)
+    universe = await sync_to_async(get_universe_cached)()
+    matches = await run_in_pool(view_pool(), scan_at_200dma, universe, tol=tol)
     take = matches[:max_matches]
 
     # 2) gather context per symbol (history -> signals, events)
+    # history + TA kernels and the announcement fan-out run side by side
+    async def signals_for(ms):
+        frames = await run_in_pool(view_pool(), fetch_histories,
+                                   [m.symbol for m in ms], columns=["Close", "High", "Low"])
+        have = [m for m in ms if m.symbol in frames]
+        sigs = await run_in_pool(view_pool(), compute_signals_many, [frames[m.symbol] for m in have])
+        return {m.symbol: sig for m, sig in zip(have, sigs) if sig is not None}
+
+    signals, ann_lists = await asyncio.gather(
+        signals_for(take),
+        fetch_many_announcements([m.base for m in take], limit=4),
+    )
+
     rows = []
-    for m in take:
-        df = fetch_history(m.symbol)
-        if df is None or df.empty: 
+    for m, anns in zip(take, ann_lists):
+        sig = signals.get(m.symbol)
+        if sig is None:
             continue
-        sig = compute_signals(df)
-        base = m.symbol.replace(".NS","")
-        # optional event window
-        anns = fetch_nse_announcements(base, limit=4) if 'fetch_nse_announcements' in globals() else []
-        evsum = has_upcoming_event(anns, window_days=event_window) if anns else {"has_upcoming": False,"next_event": None}
+        # no announcements -> next_event is null (the API's shape; api_scan differs)
+        evsum = has_upcoming_event(anns, window_days=event_window) if anns else {"has_upcoming": False, "next_event": None}
         rows.append({
-            "symbol": m.symbol, "display": f"{base}" + (" (NIFTY50)" if m.in_nifty50 else ""),
+            "symbol": m.symbol, "base": m.base, "display": m.display,
             "in_nifty50": m.in_nifty50,
             "close": m.close, "sma200": m.sma200, "distance_pct": m.distance_pct,
             "signals": sig,
             "events": {"announcements": anns, "summary": evsum}
         })
 
-    # 3) call LLM per symbol (small pool)
-    def task(row):
-        ctx = {
+    # 3) call LLM, several symbols per prompt (token-packed, 2 prompts in flight)
+    def build_ctx(row):
+        return {
             "close": row["close"],
             "sma200": row["sma200"],
             "distance_pct": row["distance_pct"],
@@ -67,30 +85,26 @@ def api_advise_llm(request):
             "prefer_credit": prefer_credit,
             "expiry_hint": "near-month"
         }
-        plan = ask_llm_for_strategy(row["symbol"], row["symbol"].replace(".NS",""), ctx, timeout=25.0)
-        return row, plan
+
+    items = [(row["symbol"], row["base"], build_ctx(row)) for row in rows]
+    plans = await ask_llm_for_strategies_batch(items, concurrency=2)
 
     out = []
-    with ThreadPoolExecutor(max_workers=3) as ex:
-        futures = [ex.submit(task, r) for r in rows]
-        for f in as_completed(futures):
-            row, plan = f.result()
-            out.append({
-                "symbol": row["symbol"],
-                "display": row["display"],
-                "close": row["close"],
-                "sma200": row["sma200"],
-                "distance_pct": row["distance_pct"],
-                "signals": row["signals"],
-                "events": row["events"]["summary"],
-                "advice": plan  # JSON with bias, strategies, entry/stop/targets
-            })
-
-    data = {"count": len(out), "tolerance": tol, "results": out}
-    cache.set(cache_key, data, timeout=30*60)
-    return JsonResponse(data, safe=False)
+    for row, plan in zip(rows, plans):
+        out.append({
+            "symbol": row["symbol"],
+            "display": row["display"],
+            "close": row["close"],
+            "sma200": row["sma200"],
+            "distance_pct": row["distance_pct"],
+            "signals": row["signals"],
+            "events": row["events"]["summary"],
+            "advice": plan  # JSON with bias, strategies, entry/stop/targets
+        })
+
+    return {"count": len(out), "tolerance": tol, "results": out}
 
 
 
 def api_llm_health(request):
-    return JsonResponse(llm_health(), safe=False)
\ No newline at end of file
+    return ORJsonResponse(llm_health())
\ No newline at end of file